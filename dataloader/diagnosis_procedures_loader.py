@@ -1,5 +1,6 @@
 import sqlite3 as sql
-from typing import List
+from typing import List, Tuple
+import numpy as np
 import pandas as pd
 
 class DiagnosisProceduresLoader:
@@ -16,65 +17,103 @@ class DiagnosisProceduresLoader:
         self.database_path = database_path
         self.connection = sql.connect(database_path)
         self.cur = self.connection.cursor()
+        # Keep hot pages, sorts and temporary tables in memory while building and aggregating the filtered tables.
+        # Only connection-level settings are changed here; nothing is persisted to the database file.
+        self.cur.executescript(
+            """
+            PRAGMA synchronous=NORMAL;
+            PRAGMA cache_size=-262144;
+            PRAGMA mmap_size=1073741824;
+            PRAGMA temp_store=MEMORY;
+            """
+        )
         self.placeholder = '?'
         self.diagnosis_codes = diagnosis_codes
         self.procedure_codes = procedure_codes
         self.excluded_diagnoses = excluded_diagnoses
+        self._create_code_tables()
 
-    def get_doctor_diagnosis_procedure_data(self) -> pd.DataFrame:
+    def get_doctor_diagnosis_procedure_data(self, chunksize: int = 100_000) -> pd.DataFrame:
         """Return a dataframe containing doctor-specific information for number of patients diagnosed and/or operated on as specified.
         
-        Columns of returned dataframe:
+        Rows are returned in no particular order; rankings are produced separately by a `DoctorRanker`.
+
+        Args:
+            chunksize (int): Number of rows to stream from the database at a time while building the dataframe.
+
+        Index of returned dataframe:
             doctor_id (str): Unique identifier for each qualifying doctor the database.
+
+        Columns of returned dataframe:
             num_diagnosed (int): Number of patients diagnosed by each doctor as specified by `self.diagnosis_codes`
             num_operated_on (int): Number of patients who were referred by each doctor to a procedure as specified by `self.procedure_codes`
         """
+        # Stream the result in chunks and concatenate once, rather than materializing every row up front.
+        chunks = list(pd.read_sql_query(
+            self._prepare_doctor_counts_query(), self.connection, index_col="doctor_id", chunksize=chunksize
+        ))
+        combined_df = pd.concat(chunks)
+
+        # pandas ignores `index_col` when a chunked query returns no rows, so set the index here in that case.
+        if "doctor_id" in combined_df.columns:
+            combined_df.set_index("doctor_id", inplace=True)
+
+        return combined_df
+
+    def get_doctor_diagnosis_procedure_arrays(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Return the same doctor-specific counts as `get_doctor_diagnosis_procedure_data`, as flat NumPy arrays.
+
+        This skips building a dataframe, and the arrays can be passed straight to `RateEstimator.batch_build`.
+        Rows are returned in no particular order.
+
+        Returns:
+            doctor_ids (np.ndarray): Unique identifier for each qualifying doctor the database.
+            num_operated_on (np.ndarray): Number of patients who were referred by each doctor to a procedure as specified by `self.procedure_codes`
+            num_diagnosed (np.ndarray): Number of patients diagnosed by each doctor as specified by `self.diagnosis_codes`
+        """
+        result = self.cur.execute(self._prepare_doctor_counts_query())
+        records = np.fromiter(
+            result,
+            dtype=[("doctor_id", object), ("num_diagnosed", np.int64), ("num_operated_on", np.int64)],
+        )
+
+        return records["doctor_id"], records["num_operated_on"], records["num_diagnosed"]
+
+    def _prepare_doctor_counts_query(self) -> str:
+        """Create the filtered tables to aggregate data from and return the query that counts patients per doctor."""
         # Create diagnosis and procedure tables to aggregate data from.
         self._create_diagnosis_table()
         self._create_procedure_table()
-        
-        # Run data aggregations.
-        query_to_count_diagnosed_patients_operated_on = (
+        self._create_indexes()
+
+        # Count diagnosed patients and those of them referred to a procedure in a single aggregation.
+        query_to_count_diagnosed_patients_and_operated_on = (
         """
-        SELECT diagnosis.doctor_id, COUNT(DISTINCT diagnosis.patient_id) as num_operated_on
+        SELECT diagnosis.doctor_id,
+            COUNT(DISTINCT diagnosis.patient_id) as num_diagnosed,
+            COUNT(DISTINCT CASE WHEN procedures.encounter_key IS NOT NULL THEN diagnosis.patient_id END) as num_operated_on
         FROM diagnosis_table as diagnosis
-        INNER JOIN procedures_table as procedures
+        LEFT JOIN procedures_table as procedures
             ON diagnosis.encounter_key == procedures.encounter_key
 
-        GROUP BY diagnosis.doctor_id
-        ORDER BY num_operated_on DESC;
-        """
-        )
-        result = self.cur.execute(query_to_count_diagnosed_patients_operated_on)
-        diagnosed_and_operated_on_df = pd.DataFrame(result.fetchall())
-        diagnosed_and_operated_on_df.columns = [ x[0] for x in result.description ]
-        diagnosed_and_operated_on_df.set_index("doctor_id", inplace=True)
-
-        query_to_count_total_diagnosed_patients = (
-        """
-        SELECT doctor_id, COUNT(DISTINCT patient_id) as num_diagnosed
-        FROM diagnosis_table
-        GROUP BY doctor_id
-        ORDER BY num_diagnosed DESC;
+        GROUP BY diagnosis.doctor_id;
         """
         )
-        result = self.cur.execute(query_to_count_total_diagnosed_patients)
-        diagnosed_df = pd.DataFrame(result.fetchall())
-        diagnosed_df.columns = [ x[0] for x in result.description ]
-        diagnosed_df.set_index("doctor_id", inplace=True)
-
-        combined_df = diagnosed_df.join(diagnosed_and_operated_on_df, on="doctor_id")
-        combined_df["num_operated_on"].fillna(0, inplace=True)
 
-        return combined_df
+        return query_to_count_diagnosed_patients_and_operated_on
 
     def _create_diagnosis_table(self) -> None:
         """Create filtered table from database containing only diagnoses of interest."""
 
-        # To avoid injection attacks, we should only insert the placeholder character into a query
-        placeholders = ', '.join(self.placeholder for _ in self.diagnosis_codes)
-        num_columns_to_search = 26
-        substitution = self.diagnosis_codes*num_columns_to_search + [self.excluded_diagnoses]*num_columns_to_search
+        # Filter row by row, checking each diagnosis column against the temporary code table. The excluded pattern is
+        # bound once as a named parameter, so the number of bound values no longer grows with the number of columns.
+        diagnosis_columns = ['DA'] + [f'D{i}' for i in range(1, 26)]
+        diagnosis_of_interest = ' OR\n                '.join(
+            f"{column} IN (SELECT code FROM temp._dx_codes)" for column in diagnosis_columns
+        )
+        no_excluded_diagnosis = '\n                AND '.join(
+            f"{column} NOT LIKE (:excluded_diagnoses)" for column in diagnosis_columns
+        )
 
         query = (
             f"""
@@ -83,78 +122,46 @@ class DiagnosisProceduresLoader:
             FROM medical_headers
             WHERE (
 
-                (DA IN ({placeholders}) OR
-                D1 IN ({placeholders}) OR
-                D2 IN ({placeholders}) OR
-                D3 IN ({placeholders}) OR
-                D4 IN ({placeholders}) OR
-                D5 IN ({placeholders}) OR
-                D6 IN ({placeholders}) OR
-                D7 IN ({placeholders}) OR
-                D8 IN ({placeholders}) OR
-                D9 IN ({placeholders}) OR
-                D10 IN ({placeholders}) OR
-                D11 IN ({placeholders}) OR
-                D12 IN ({placeholders}) OR
-                D13 IN ({placeholders}) OR
-                D14 IN ({placeholders}) OR
-                D15 IN ({placeholders}) OR
-                D16 IN ({placeholders}) OR
-                D17 IN ({placeholders}) OR
-                D18 IN ({placeholders}) OR
-                D19 IN ({placeholders}) OR
-                D20 IN ({placeholders}) OR
-                D21 IN ({placeholders}) OR
-                D22 IN ({placeholders}) OR
-                D23 IN ({placeholders}) OR
-                D24 IN ({placeholders}) OR
-                D25 IN ({placeholders}))
-                
-                AND DA NOT LIKE (?)
-                AND D1 NOT LIKE (?)
-                AND D2 NOT LIKE (?)
-                AND D3 NOT LIKE (?)
-                AND D4 NOT LIKE (?)
-                AND D5 NOT LIKE (?)
-                AND D6 NOT LIKE (?)
-                AND D7 NOT LIKE (?)
-                AND D8 NOT LIKE (?)
-                AND D9 NOT LIKE (?)
-                AND D10 NOT LIKE (?)
-                AND D11 NOT LIKE (?)
-                AND D12 NOT LIKE (?)
-                AND D13 NOT LIKE (?)
-                AND D14 NOT LIKE (?)
-                AND D15 NOT LIKE (?)
-                AND D16 NOT LIKE (?)
-                AND D17 NOT LIKE (?)
-                AND D18 NOT LIKE (?)
-                AND D19 NOT LIKE (?)
-                AND D20 NOT LIKE (?)
-                AND D21 NOT LIKE (?)
-                AND D22 NOT LIKE (?)
-                AND D23 NOT LIKE (?)
-                AND D24 NOT LIKE (?)
-                AND D25 NOT LIKE (?)
+                ({diagnosis_of_interest})
+
+                AND {no_excluded_diagnosis}
             );
             """
         )
-        self.cur.execute(query, substitution)
+        self.cur.execute(query, {"excluded_diagnoses": self.excluded_diagnoses})
 
     def _create_procedure_table(self):
         """Create a filtered table in the database containing only rows corresponding to procedures of interest."""
-        
-        # To avoid injection attacks, we should only insert the placeholder character into a query
-        placeholders = ', '.join(self.placeholder for _ in self.procedure_codes)
         query = (
-            f"""
+            """
             CREATE TABLE IF NOT EXISTS procedures_table AS
             SELECT encounter_key, procedure
             FROM medical_service_lines
-            WHERE procedure IN ({placeholders});
+            WHERE procedure IN (SELECT code FROM temp._cpt_codes);
             """
         )
-        self.cur.execute(query, self.procedure_codes)
+        self.cur.execute(query)
+
+    def _create_code_tables(self) -> None:
+        """Load the diagnosis and procedure codes of interest into temporary lookup tables.
+
+        Filtering against these tables keeps the filtering queries fixed, no matter how many codes are specified.
+        """
+        # Only our own fixed table names are interpolated here; the codes themselves are always bound through placeholders.
+        for table, codes in (("temp._dx_codes", self.diagnosis_codes), ("temp._cpt_codes", self.procedure_codes)):
+            self.cur.execute(f"CREATE TABLE IF NOT EXISTS {table} (code TEXT PRIMARY KEY);")
+            self.cur.executemany(f"INSERT OR IGNORE INTO {table} VALUES ({self.placeholder});", [(code,) for code in codes])
+
+    def _create_indexes(self) -> None:
+        """Index the filtered diagnosis and procedure tables on the columns used to join and aggregate them."""
+        # Executed one at a time (rather than via executescript) so they stay in the loader's open transaction.
+        self.cur.execute("CREATE INDEX IF NOT EXISTS ix_diagnosis_encounter ON diagnosis_table(encounter_key);")
+        self.cur.execute("CREATE INDEX IF NOT EXISTS ix_procedures_encounter ON procedures_table(encounter_key);")
+        self.cur.execute("CREATE INDEX IF NOT EXISTS ix_diagnosis_doctor_patient ON diagnosis_table(doctor_id, patient_id);")
+
+        # Gather statistics so the query planner can choose between the indexes based on table cardinality.
+        self.cur.execute("ANALYZE diagnosis_table;")
+        self.cur.execute("ANALYZE procedures_table;")
 
     def __enter__(self):
         """Allows dataloader to be used in a context manager."""
@@ -167,4 +174,5 @@ class DiagnosisProceduresLoader:
             self.connection.rollback()
         else:
             self.connection.commit()
+        self.connection.execute("PRAGMA optimize;")
         self.connection.close()
@@ -1,2 +1,3 @@
 from .bayesian_estimator import BayesianEstimator
+from .beta_rate_estimator import BetaRateEstimator
 from .rate_estimator import RateEstimator
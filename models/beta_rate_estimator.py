@@ -0,0 +1,96 @@
+from typing import Optional, Tuple, Union
+from matplotlib.axes import Axes
+from matplotlib.lines import Line2D
+import numpy as np
+from scipy import stats
+from models import BayesianEstimator
+from models.plotting import plot_posterior_curve
+
+class BetaRateEstimator(BayesianEstimator):
+    """Models the distribution of an unknown rate in a binomial likelihood process, given a Beta prior.
+
+    A Beta prior is conjugate to the binomial likelihood, so the posterior of the unknown rate p is the closed-form
+    Beta(prior_alpha + num_successes, prior_beta + num_observations - num_successes) distribution. Unlike a
+    RateEstimator, no discretized support is needed and every summary statistic is computed in constant time.
+
+    Attributes:
+        prior_alpha (float): First shape parameter of the Beta prior of the unknown rate.
+        prior_beta (float): Second shape parameter of the Beta prior of the unknown rate.
+        posterior (scipy.stats.rv_continuous): Frozen Beta posterior distribution of the unknown rate.
+        posterior_alpha (float): First shape parameter of the Beta posterior.
+        posterior_beta (float): Second shape parameter of the Beta posterior.
+        num_successes (int): Number of observed "successes" (as defined by whatever binomial distribution is
+                             being modeled by this estimator).
+        num_observations (int): Number of total observations out of which `num_successes` occurred.
+    """
+    def __init__(self, prior_alpha: float, prior_beta: float, num_successes: int, num_trials: int):
+        """Create a BetaRateEstimator with given Beta prior parameters and observations.
+
+        Args:
+            prior_alpha (float): First shape parameter of the Beta prior of the unknown rate.
+            prior_beta (float): Second shape parameter of the Beta prior of the unknown rate.
+            num_successes (int): Number of observed "successes" (as defined by whatever binomial distribution is
+                             being modeled by this estimator).
+            num_trials (int): Number of total observations out of which `num_successes` occurred.
+        """
+        self.prior_alpha = prior_alpha
+        self.prior_beta = prior_beta
+        self.num_successes = num_successes
+        self.num_observations = num_trials
+        self.posterior_alpha = prior_alpha + num_successes
+        self.posterior_beta = prior_beta + num_trials - num_successes
+        self.posterior = self._compute_posterior()
+
+    def _compute_posterior(self):
+        """Return the conjugate Beta posterior distribution of the unknown rate."""
+        return stats.beta(self.posterior_alpha, self.posterior_beta)
+
+    def compute_MAP_estimate(self) -> float:
+        """Return the Bayesian 'Maximum a Priori' point estimate for the true value of the unknown rate (the posterior mode)."""
+        a, b = self.posterior_alpha, self.posterior_beta
+        if a > 1 and b > 1:
+            return (a - 1) / (a + b - 2)
+
+        # Otherwise the density is maximized at a boundary (or is flat, when a == b == 1).
+        if a == b == 1:
+            return 0.5
+        return 0.0 if a <= b else 1.0
+
+    def compute_credible_interval(self, alpha=0.05) -> Tuple[float, float]:
+        """Return the centered Bayesian (1-alpha)-credible interval for the unknown rate.
+
+        Args:
+            alpha (float): Determines the width of the credible interval (the amount of posterior
+                           probability in the interval is 1 - alpha)
+
+        Returns:
+            credible_interval (tuple): Tuple containing left and right endpoints of desired credible interval.
+        """
+        return (self.posterior.ppf(alpha / 2), self.posterior.ppf(1 - alpha / 2))
+
+    def compute_expected_value(self) -> float:
+        """Return the posterior distribution's expected value for the unknown rate."""
+        return self.posterior_alpha / (self.posterior_alpha + self.posterior_beta)
+
+    def plot_posterior(self, x_lim: Tuple[Union[int, float], Union[int, float]] = (0, 1), show=False, num_points=1000, ax: Optional[Axes] = None, line: Optional[Line2D] = None, **plt_kwargs) -> Line2D:
+        """Plot the posterior distribution for the unknown rate.
+
+        Callers plotting many posteriors should pass a shared `ax`, and may pass the line returned by a previous call
+        as `line` to redraw it with this posterior via `set_data` instead of creating a new Line2D.
+
+        Args:
+            x_lim (tuple): Tuple specifying left/right endpoints for posterior plot.
+            show (bool): Specifies whether to call plt.show() on generated plot. Defaults to False.
+            num_points (int): Number of evenly spaced rates in `x_lim` at which the posterior density is evaluated.
+            ax (Axes): Axes to plot on. Defaults to the current axes.
+            line (Line2D): Existing line to update with this posterior. Defaults to plotting a new line on `ax`.
+            **plt_kwargs: Allows for passing in matplotlib-specific arguments to the plt.plot() (such as label, color, etc.)
+
+        Returns:
+            line (Line2D): The line displaying the posterior.
+
+        Raises:
+            ValueError if both `ax` and `line` are given and `line` is not drawn on `ax`.
+        """
+        rates = np.linspace(*x_lim, num_points)
+        return plot_posterior_curve(rates, self.posterior.pdf(rates), x_lim, show, ax, line, **plt_kwargs)
@@ -0,0 +1,54 @@
+"""Plotting helpers shared by the Bayesian estimators."""
+
+from typing import Optional, Tuple, Union
+import matplotlib.pyplot as plt
+from matplotlib.axes import Axes
+from matplotlib.lines import Line2D
+import numpy as np
+
+def plot_posterior_curve(
+    x: np.ndarray,
+    y: np.ndarray,
+    x_lim: Tuple[Union[int, float], Union[int, float]],
+    show: bool,
+    ax: Optional[Axes] = None,
+    line: Optional[Line2D] = None,
+    **plt_kwargs,
+) -> Line2D:
+    """Draw a posterior density curve, either as a new line or by updating an existing one.
+
+    Args:
+        x (np.ndarray): Rates at which the posterior density is evaluated.
+        y (np.ndarray): Posterior density at each rate in `x`.
+        x_lim (tuple): Tuple specifying left/right endpoints for posterior plot.
+        show (bool): Specifies whether to call plt.show() on generated plot.
+        ax (Axes): Axes to plot on. Defaults to the axes of `line`, or else the current axes.
+        line (Line2D): Existing line to update via `set_data`. Defaults to plotting a new line on `ax`.
+        **plt_kwargs: Allows for passing in matplotlib-specific arguments to the plt.plot() (such as label, color, etc.)
+
+    Returns:
+        line (Line2D): The line displaying the posterior.
+
+    Raises:
+        ValueError if both `ax` and `line` are given and `line` is not drawn on `ax`.
+    """
+    if line is not None and ax is not None and line.axes is not ax:
+        raise ValueError("The given line is not drawn on the given Axes.")
+    if ax is None:
+        ax = line.axes if line is not None else plt.gca()
+
+    if line is None:
+        line, = ax.plot(x, y, **plt_kwargs)
+    else:
+        line.set_data(x, y)
+        if plt_kwargs:
+            line.set(**plt_kwargs)
+        # set_data doesn't update the data limits, so rescale to fit the new curve.
+        ax.relim()
+        ax.autoscale_view()
+    ax.set_xlim(*x_lim)
+
+    if show:
+        plt.show()
+
+    return line
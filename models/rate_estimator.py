@@ -1,8 +1,10 @@
-from typing import Tuple, Union
-import matplotlib.pyplot as plt
+from typing import Dict, Hashable, Optional, Sequence, Tuple, Union
+from matplotlib.axes import Axes
+from matplotlib.lines import Line2D
 import numpy as np
 from scipy import stats
-from models import BayesianEstimator
+from models import BayesianEstimator, BetaRateEstimator
+from models.plotting import plot_posterior_curve
 
 class RateEstimator(BayesianEstimator):
     """Models the distribution of an unknown rate in a binomial likelihood process.
@@ -20,7 +22,7 @@ class RateEstimator(BayesianEstimator):
                              being modeled by this estimator).
         num_observations (int): Number of total observations out of which `num_successes` occurred.
     """
-    def __init__(self, prior: np.ndarray, support: np.ndarray, num_successes: int, num_trials: int):
+    def __init__(self, prior: np.ndarray, support: np.ndarray, num_successes: int, num_trials: int, dtype=np.float32):
         """Create a RateEstimator with given prior and observations.
         
         Upon creation, provided with data `num_successes` and `num_trials`, the estimator computes a posterior
@@ -33,15 +35,107 @@ class RateEstimator(BayesianEstimator):
             num_successes (int): Number of observed "successes" (as defined by whatever binomial distribution is
                              being modeled by this estimator).
             num_observations (int): Number of total observations out of which `num_successes` occurred.
+            dtype (np.dtype): Floating point type used to store the posterior and to reduce over it (MAP estimate and
+                              expected value). Defaults to np.float32, halving the posterior's memory and the traffic
+                              of those reductions; pass np.float64 for full precision. The CDF used for credible
+                              intervals is always built once in float64.
         """
         # super(prior, likelihood=binomial, support=support, data=num_referrals, num_benign).__init__()
+        self._initialize(prior, support, num_successes, num_trials, dtype)
+
+    def _initialize(
+        self,
+        prior: np.ndarray,
+        support: np.ndarray,
+        num_successes: int,
+        num_trials: int,
+        dtype,
+        posterior: Optional[np.ndarray] = None,
+        cdf: Optional[np.ndarray] = None,
+        support_at_dtype: Optional[np.ndarray] = None,
+    ) -> None:
+        """Set up the estimator's state, computing the posterior and its CDF unless they are already known.
+
+        Shared by `__init__` and `batch_build`, so estimators created either way carry the same attributes.
+        The posterior is stored as `dtype`, while the support keeps the caller's precision so that the returned
+        summary statistics are exact support values. A copy of the support at `dtype` (shared when passed in) lets the
+        expected value be reduced without upcasting the posterior.
+        """
         self.prior = prior
         self.num_successes = num_successes
         self.num_observations = num_trials
         self.support = support
         self.h = support[1] - support[0]
-        self.posterior = self._compute_posterior()
-    
+        if posterior is None:
+            posterior = self._compute_posterior()
+        # Posterior probability mass strictly to the left of each support point (with total mass as the last entry).
+        self._cdf = self._compute_cdf(posterior, self.h) if cdf is None else cdf
+        self.posterior = posterior.astype(dtype, copy=False)
+        self._support_at_dtype = np.asarray(support, dtype=dtype) if support_at_dtype is None else support_at_dtype
+
+        # Summary statistics are computed lazily and cached, since the posterior never changes after creation.
+        self._map_estimate = None
+        self._expected_value = None
+        self._credible_intervals = {}
+
+    @staticmethod
+    def from_beta_prior(prior_alpha: float, prior_beta: float, num_successes: int, num_trials: int) -> BetaRateEstimator:
+        """Create an estimator for a Beta prior, using the closed-form conjugate posterior instead of a discretized one.
+
+        See `BetaRateEstimator` for details. The returned estimator needs no support grid.
+        """
+        return BetaRateEstimator(prior_alpha, prior_beta, num_successes, num_trials)
+
+    @classmethod
+    def batch_build(
+        cls,
+        prior: np.ndarray,
+        support: np.ndarray,
+        num_successes: Sequence[int],
+        num_trials: Sequence[int],
+        keys: Sequence[Hashable],
+        dtype=np.float32,
+    ) -> Dict[Hashable, "RateEstimator"]:
+        """Create many RateEstimators sharing the same prior and support in a single vectorized pass.
+
+        The posteriors of all estimators are computed together as one (len(keys) x len(support)) array, and
+        each returned estimator holds a row of that array as its posterior.
+
+        Args:
+            prior (np.ndarray): Discretized prior pdf of the unknown rate, shared by all estimators.
+            support (np.ndarray): Discrete values of the unknown rate for which the posterior densities are computed.
+            num_successes (sequence(int)): Number of observed "successes" for each estimator.
+            num_trials (sequence(int)): Number of total observations for each estimator.
+            keys (sequence): Identifier for each estimator (ex. doctor ids), in the same order as the observations.
+            dtype (np.dtype): Floating point type used to store and reduce over the posteriors. Defaults to np.float32.
+
+        Returns:
+            estimators (dict): Dictionary mapping each key to its RateEstimator.
+
+        Raises:
+            ValueError if `keys`, `num_successes`, and `num_trials` are not all the same length.
+        """
+        num_successes = np.asarray(num_successes)
+        num_trials = np.asarray(num_trials)
+        if not len(keys) == len(num_successes) == len(num_trials):
+            raise ValueError("keys, num_successes, and num_trials must all have the same length.")
+
+        h = support[1] - support[0]
+        posteriors = cls._posterior_from_observations(prior, support, h, num_successes[:, None], num_trials[:, None])
+        cdfs = cls._compute_cdf(posteriors, h)
+        posteriors = posteriors.astype(dtype, copy=False)
+        support_at_dtype = np.asarray(support, dtype=dtype)
+
+        estimators = dict()
+        for i, key in enumerate(keys):
+            estimator = cls.__new__(cls)
+            estimator._initialize(
+                prior, support, num_successes[i], num_trials[i], dtype, posteriors[i], cdfs[i], support_at_dtype
+            )
+            estimators[key] = estimator
+
+        return estimators
+
     def _compute_posterior(self) -> Tuple[np.ndarray, np.ndarray]:
         """Compute the estimated posterior distribution of the unknown rate.
 
@@ -52,18 +146,46 @@ class RateEstimator(BayesianEstimator):
             posterior (np.ndarray): Posterior densities for all possible rates in `self.support`. This is
                                     a discrete approximation of the posterior pdf for the unknown rate.
         """
-        likelihood = lambda p: stats.binom(self.num_observations, p).pmf(self.num_successes)
+        return self._posterior_from_observations(
+            self.prior, self.support, self.h, self.num_successes, self.num_observations
+        )
 
-        likelihoods = np.array([likelihood(p) for p in self.support])
+    @staticmethod
+    def _posterior_from_observations(
+        prior: np.ndarray,
+        support: np.ndarray,
+        h: float,
+        num_successes: Union[int, np.ndarray],
+        num_trials: Union[int, np.ndarray],
+    ) -> np.ndarray:
+        """Return discretized posterior pdf(s) over `support`, broadcasting observations against the last axis.
+
+        The posterior is computed and returned in float64; callers downcast it for storage. The prior is left at the
+        caller's precision, since its far tails can underflow in float32 and dominate the posterior for extreme data.
+        """
+        # Work in log space so the binomial likelihood doesn't underflow for large numbers of observations.
+        with np.errstate(divide='ignore'):
+            log_likelihoods = stats.binom.logpmf(num_successes, num_trials, support)
+            log_numerator = np.log(prior) + log_likelihoods    # Form of the posterior.
+
+        numerator = np.exp(log_numerator - log_numerator.max(axis=-1, keepdims=True))
+        posterior = numerator / (numerator.sum(axis=-1, keepdims=True) * h) # Makes it so the posterior is a pdf (integrates to 1).
 
-        numerator = self.prior * likelihoods    # Form of the posterior.
-        posterior = numerator / (numerator*self.h).sum() # Makes it so the posterior is a pdf (integrates to 1).
-        
         return posterior
 
+    @staticmethod
+    def _compute_cdf(posterior: np.ndarray, h: float) -> np.ndarray:
+        """Return the posterior mass strictly to the left of each support point, with the total mass appended."""
+        # Accumulate in float64 so rounding error doesn't build up across the support.
+        cumulative_mass = np.cumsum(posterior, axis=-1, dtype=np.float64) * h
+        zeros = np.zeros(cumulative_mass.shape[:-1] + (1,))
+        return np.concatenate((zeros, cumulative_mass), axis=-1)
+
     def compute_MAP_estimate(self) -> float:
         """Return the Bayesian 'Maximum a Priori' point estimate for the true value of the unknown rate."""
-        return self.support[self.posterior.argmax()]
+        if self._map_estimate is None:
+            self._map_estimate = float(self.support[self.posterior.argmax()])
+        return self._map_estimate
 
     def compute_credible_interval(self, alpha=0.05) -> Tuple[float, float]:
         """Return the centered Bayesian (1-alpha)-credible interval for the unknown rate.
@@ -75,34 +197,42 @@ class RateEstimator(BayesianEstimator):
         Returns:
             credible_interval (tuple): Tuple containing left and right endpoints of desired credible interval.
         """
+        if alpha in self._credible_intervals:
+            return self._credible_intervals[alpha]
+
         # Search left tail until (alpha / 2) probability is accounted for to the left.
-        probability_sum, i = 0, 0
-        while probability_sum < (alpha) / 2:
-            probability_sum += self.h * self.posterior[i]
-            i += 1
+        i = np.searchsorted(self._cdf, alpha / 2, side='left')
 
         # Search right tail until (alpha / 2) probability is accounted for to the right.
-        probability_sum, j = 0, len(self.posterior) - 1
-        while probability_sum < (alpha) / 2:
-            probability_sum += self.h * self.posterior[j]
-            j -= 1
+        j = np.searchsorted(self._cdf, self._cdf[-1] - alpha / 2, side='right') - 2
 
-        return (self.support[i], self.support[j])
+        self._credible_intervals[alpha] = (float(self.support[i]), float(self.support[j]))
+        return self._credible_intervals[alpha]
 
     def compute_expected_value(self) -> float:
         """Return the posterior distribution's expected value for the unknown rate."""
-        return (self.support * self.posterior).sum() / self.posterior.sum()
+        if self._expected_value is None:
+            # The posterior integrates to 1 over the support, so no further normalization is needed.
+            self._expected_value = float(np.dot(self._support_at_dtype, self.posterior) * self.h)
+        return self._expected_value
 
-    def plot_posterior(self, x_lim: Tuple[Union[int, float], Union[int, float]] = (0, 1), show=False, **plt_kwargs):
+    def plot_posterior(self, x_lim: Tuple[Union[int, float], Union[int, float]] = (0, 1), show=False, ax: Optional[Axes] = None, line: Optional[Line2D] = None, **plt_kwargs) -> Line2D:
         """Plot the posterior distribution for the unknown rate.
         
+        Callers plotting many posteriors should pass a shared `ax`, and may pass the line returned by a previous call
+        as `line` to redraw it with this posterior via `set_data` instead of creating a new Line2D.
+
         Args:
             x_lim (tuple): Tuple specifying left/right endpoints for posterior plot.
             show (bool): Specifies whether to call plt.show() on generated plot. Defaults to False.
+            ax (Axes): Axes to plot on. Defaults to the current axes.
+            line (Line2D): Existing line to update with this posterior. Defaults to plotting a new line on `ax`.
             **plt_kwargs: Allows for passing in matplotlib-specific arguments to the plt.plot() (such as label, color, etc.)
-        """
-        plt.plot(self.support, self.posterior, **plt_kwargs)
-        plt.xlim(*x_lim)
 
-        if show:
-            plt.show()
+        Returns:
+            line (Line2D): The line displaying the posterior.
+
+        Raises:
+            ValueError if both `ax` and `line` are given and `line` is not drawn on `ax`.
+        """
+        return plot_posterior_curve(self.support, self.posterior, x_lim, show, ax, line, **plt_kwargs)
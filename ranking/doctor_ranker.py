@@ -1,7 +1,48 @@
-from typing import Dict
+from typing import Any, Dict, Set, Tuple
+import numpy as np
+import pandas as pd
 from models import BayesianEstimator
 from util import metrics, orderings
 
+try:
+    from numba import njit
+except ImportError:
+    # numba is optional; without it the interval sweep below simply runs as plain Python.
+    def njit(*args, **kwargs):
+        return lambda function: function
+
+
+@njit(cache=True)
+def _rank_sorted_intervals(lefts: np.ndarray, rights: np.ndarray, reverse: bool) -> np.ndarray:
+    """Return the rank of each interval, given interval endpoints already in sorted order.
+
+    Rank only goes down when an interval is disjoint from the "benchmark" interval, i.e. the first interval
+    assigned the current rank. Since the benchmark depends on every earlier rank change, this is a sequential sweep.
+    """
+    ranks = np.empty(len(lefts), dtype=np.int64)
+    if len(lefts) == 0:
+        return ranks
+
+    # The first interval always starts rank 1 (even if it is degenerate, with left > right).
+    current_rank = 1
+    ranks[0] = current_rank
+    benchmark_left, benchmark_right = lefts[0], rights[0]
+    for i in range(1, len(lefts)):
+
+        if reverse:
+            interval_disjoint_from_benchmark = rights[i] < benchmark_left
+        else:
+            interval_disjoint_from_benchmark = lefts[i] > benchmark_right
+
+        if interval_disjoint_from_benchmark:
+            current_rank += 1
+            benchmark_left, benchmark_right = lefts[i], rights[i]
+
+        ranks[i] = current_rank
+
+    return ranks
+
+
 class RankCriteria:
 
     def __init__(self, metric: str, ordering: str):
@@ -26,10 +67,13 @@ class DoctorRanker:
         self.criteria = criteria
         self.estimators = estimators
 
-    def get_rankings(self) -> Dict[int, str]:
+    def get_rankings(self) -> pd.DataFrame:
         """Return prioritized rankings of doctors based on specified criteria.
         
-        Rankings are returned as a dictionary mapping numeric rank to an unordered set of tuples (doctor_id, metric).
+        Rankings are returned as a dataframe with one row per doctor, sorted by rank, with columns:
+            doctor_id (hashable): Identifier of the doctor (the key of the doctor's estimator, unchanged).
+            metric (float or tuple): Value of the ranking metric for the doctor (a (left, right) tuple for intervals).
+            rank (int): Numeric rank of the doctor, starting at 1. Several doctors may share a rank.
 
         For point estimates, rank is determined by simply looking in sorted order at the metric values. For intervals,
         however, a more nuanced approach is taken:
@@ -40,54 +84,76 @@ class DoctorRanker:
             assigned rank 1. For the first disjoint interval (whose boundaries do not intersect the rank 1 interval), a rank
             of 2 is assigned, and the process repeats itself.  
         """
-        doctors, posteriors = self.estimators.keys(), self.estimators.values()
+        doctors, posteriors = list(self.estimators.keys()), self.estimators.values()
         reverse = (self.criteria.ordering == orderings.DESCENDING)
 
         if self.criteria.metric == metrics.MAP:
 
-            maps = [posterior.compute_MAP_estimate() for posterior in posteriors]
-            rankings = {
-                i+1: {(doctor, map)}
-                for i, (map, doctor) in enumerate(sorted(zip(maps, doctors), reverse=reverse))
-            }
+            maps = np.fromiter((posterior.compute_MAP_estimate() for posterior in posteriors), dtype=np.float64, count=len(posteriors))
+            order = self._order_point_estimates(doctors, maps, reverse)
+            metric_values = maps[order]
+            ranks = np.arange(1, len(order) + 1)
 
         elif self.criteria.metric == metrics.EXPECTED_VALUE:
 
-            expected_vals = [posterior.compute_expected_value() for posterior in posteriors]
-            rankings = {
-                i+1: {(doctor, expected_val)}
-                for i, (expected_val, doctor) in enumerate(sorted(zip(expected_vals, doctors), reverse=reverse))
-            }
+            expected_vals = np.fromiter((posterior.compute_expected_value() for posterior in posteriors), dtype=np.float64, count=len(posteriors))
+            order = self._order_point_estimates(doctors, expected_vals, reverse)
+            metric_values = expected_vals[order]
+            ranks = np.arange(1, len(order) + 1)
 
         elif self.criteria.metric == metrics.CREDIBLE_INTERVAL:
 
             credible_intervals = [posterior.compute_credible_interval() for posterior in posteriors]
-            credible_intervals, doctors = zip(*sorted(zip(credible_intervals, doctors), key=lambda x: x[0], reverse=reverse))
-
-            rankings = {1: set()}
-
-            rankings[1].add((doctors[0], credible_intervals[0]))
-       
-            current_rank = 1
-            benchmark_interval = credible_intervals[0]
-            for i, doctor in zip(range(1, len(credible_intervals)), doctors[1:]):
-
-                current_interval = credible_intervals[i]
-
-                interval_disjoint_from_benchmark = (
-                    current_interval[0] > benchmark_interval[1] if not reverse
-                    else current_interval[1] < benchmark_interval[0]
-                )
-
-                # Rank only goes down if current credible interval is outside the range of the "benchmark".
-                if interval_disjoint_from_benchmark:
-                    current_rank += 1
-                    benchmark_interval = current_interval
-    
-                if current_rank in rankings:
-                    rankings[current_rank].add((doctor, current_interval))
-                else:
-                    rankings[current_rank] = set()
-                    rankings[current_rank].add((doctor, current_interval))
-        
-        return rankings
+            lefts = np.array([interval[0] for interval in credible_intervals], dtype=np.float64)
+            rights = np.array([interval[1] for interval in credible_intervals], dtype=np.float64)
+
+            # Sort intervals lexicographically by (left, right) endpoints; lexsort is stable, so ties keep their order.
+            order = np.lexsort((-rights, -lefts)) if reverse else np.lexsort((rights, lefts))
+            metric_values = [credible_intervals[k] for k in order]
+            ranks = _rank_sorted_intervals(lefts[order], rights[order], reverse)
+
+        return pd.DataFrame({"doctor_id": [doctors[k] for k in order], "metric": metric_values, "rank": ranks})
+
+    def get_rankings_dict(self) -> Dict[int, Set[Tuple[str, Any]]]:
+        """Return prioritized rankings of doctors as a dictionary mapping numeric rank to an unordered set of tuples (doctor_id, metric).
+
+        See `get_rankings` for how ranks are assigned.
+        """
+        rankings = self.get_rankings()
+        ranks = rankings["rank"].to_numpy()
+        doctor_ids, metric_values = rankings["doctor_id"].tolist(), rankings["metric"].tolist()
+
+        # Rows are sorted by rank, so each rank is a contiguous run of rows that can be sliced out in one go.
+        unique_ranks, starts = np.unique(ranks, return_index=True)
+        unique_ranks, starts = unique_ranks.tolist(), starts.tolist()
+        ends = starts[1:] + [len(ranks)]
+
+        # Point estimates give every doctor its own rank, so skip the slicing when there are no shared ranks.
+        if len(unique_ranks) == len(ranks):
+            return {rank: {row} for rank, row in zip(unique_ranks, zip(doctor_ids, metric_values))}
+
+        return {
+            rank: set(zip(doctor_ids[start:end], metric_values[start:end]))
+            for rank, start, end in zip(unique_ranks, starts, ends)
+        }
+
+    @staticmethod
+    def _order_point_estimates(doctors: list, estimates: np.ndarray, reverse: bool) -> np.ndarray:
+        """Return the indices that sort `estimates`, breaking ties by doctor id."""
+        id_types = set(map(type, doctors))
+        if len(id_types) <= 1 and all(issubclass(id_type, (str, int, float)) for id_type in id_types):
+            # Homogeneous scalar ids convert to a NumPy array, so ties can be broken by a C-level lexsort.
+            doctor_keys = np.asarray(doctors)
+            if doctor_keys.dtype != object:
+                order = np.lexsort((doctor_keys, estimates))
+                return order[::-1] if reverse else order
+
+        # Otherwise (ex. tuple ids), compare ids in Python, but only within runs of tied estimates.
+        order = np.argsort(estimates, kind='stable')
+        sorted_estimates = estimates[order]
+        boundaries = np.flatnonzero(sorted_estimates[1:] != sorted_estimates[:-1]) + 1
+        for start, end in zip(np.r_[0, boundaries], np.r_[boundaries, len(order)]):
+            if end - start > 1:
+                order[start:end] = sorted(order[start:end], key=doctors.__getitem__)
+
+        return order[::-1] if reverse else order